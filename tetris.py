@@ -3,8 +3,14 @@ import random
 import math
 import json
 import os
+import queue
+import threading
+import time
+import numpy as np
 import pygame
 import pathlib
+import ctypes
+from numba import njit
 from datetime import datetime
 from OpenGL.GL import *
 from OpenGL.GLU import *
@@ -23,6 +29,7 @@ BLOCK_SIZE = 1.0         # Size of each cube in the Tetris blocks
 FALL_INTERVAL_MS = 500   # How often (milliseconds) a piece falls one step
 CAMERA_DIST_MIN = 15.0    # Minimum zoom distance
 CAMERA_DIST_MAX = 80.0    # Maximum zoom distance
+DEBUG = False             # Print debug messages (e.g. mode changes)
 
 
 # Possible colors for newly spawned blocks
@@ -36,6 +43,13 @@ CYBER_COLORS = [
     (1.0, 0.0, 0.0),     # Red (Z-piece)
 ]
 
+# Lookup table for grid cells: a cell value v > 0 is drawn with COLOR_TABLE[v - 1]
+COLOR_TABLE = np.array(CYBER_COLORS, dtype=np.float32)
+
+# Block outline colors: darker edges for definition, bright highlights
+BLOCK_EDGE_COLORS = [tuple(c * 0.7 for c in color) for color in CYBER_COLORS]
+BLOCK_HIGHLIGHT_COLORS = [tuple(min(c * 1.2, 1.0) for c in color) for color in CYBER_COLORS]
+
 # 3D Tetromino-like shapes (sample shapes).
 # Each shape is a list containing tuples of offsets (x, y, z).
 SHAPES_3D = [
@@ -56,6 +70,50 @@ SHAPES_3D = [
     [(0,0,0), (1,0,0), (1,1,0), (2,1,0)]
 ]
 
+# The same shapes as (N, 3) int8 arrays, converted once at import
+SHAPES_3D_NP = [np.asarray(s, dtype=np.int8) for s in SHAPES_3D]
+MAX_PIECE_BLOCKS = max(len(s) for s in SHAPES_3D)
+
+# 90 degree rotation matrices around the X, Y and Z axes (right-hand rule)
+ROT = np.array([
+    [[1, 0, 0], [0, 0, -1], [0, 1, 0]],   # X: (x, y, z) -> (x, -z, y)
+    [[0, 0, -1], [0, 1, 0], [1, 0, 0]],   # Y: (x, y, z) -> (-z, y, x)
+    [[0, -1, 0], [1, 0, 0], [0, 0, 1]],   # Z: (x, y, z) -> (-y, x, z)
+], dtype=np.int8)
+
+def _build_orientations(shape):
+    """
+    Walk every orientation reachable from 'shape' by the ROT rotations.
+    Returns (orientations, turns, turns_back): a list of (N, 3) int8 arrays,
+    index 0 being 'shape' itself; turns[axis][i], the orientation index
+    reached by rotating orientation i around 'axis'; and turns_back[axis][i],
+    the one reached by rotating it the opposite way.
+    """
+    orientations = [shape]
+    index = {shape.tobytes(): 0}
+    turns = [[], [], []]
+    i = 0
+    while i < len(orientations):
+        for axis in range(3):
+            rotated = (orientations[i] @ ROT[axis].T).astype(np.int8)
+            key = rotated.tobytes()
+            if key not in index:
+                index[key] = len(orientations)
+                orientations.append(rotated)
+            turns[axis].append(index[key])
+        i += 1
+
+    # Each rotation permutes the orientations, so invert the permutation
+    turns_back = [[0] * len(orientations) for _ in range(3)]
+    for axis in range(3):
+        for i, j in enumerate(turns[axis]):
+            turns_back[axis][j] = i
+    return (orientations, tuple(tuple(t) for t in turns),
+            tuple(tuple(t) for t in turns_back))
+
+# Every orientation of every shape, worked out once at import
+SHAPE_ORIENTATIONS = [_build_orientations(s) for s in SHAPES_3D_NP]
+
 # Game states
 STATE_LOADING   = 0
 STATE_MAIN_MENU = 1
@@ -63,17 +121,110 @@ STATE_PLAYING   = 2
 STATE_PAUSED    = 3
 STATE_GAME_OVER = 4
 
+# Main menu demo: how often the computer player makes a random move
+DEMO_ACTION_INTERVAL_MS = 500
+
+# Held movement keys (GLUT key repeat is off): wait MOVE_REPEAT_DELAY_MS after
+# the press before the first repeat, so a tap moves one cell, then move again
+# every MOVE_REPEAT_MS
+MOVE_REPEAT_DELAY_MS = 200
+MOVE_REPEAT_MS = 80
+
+# Modes whose screen changes every frame on its own; the others (including
+# play, where the piece only moves on a fall tick or input) are only redrawn
+# once something marks the scene dirty
+ANIMATED_MODES = (STATE_LOADING, STATE_MAIN_MENU)
+
 # Loading screen settings
 LOADING_DURATION = 3000   # Auto-advance after 3 seconds
 
 # A convenient color for 2D text
 TEXT_COLOR = (0.9, 0.9, 0.9)
 
+# 2D text is drawn from one glyph atlas texture; each (text, size) is laid
+# out into vertices once and reused
+TEXT_CACHE_MAX = 64                      # Laid out strings kept before evicting the least recently used
+TEXT_FONT_SIZES = {10: 14, 12: 16, 18: 24}  # pygame default font sizes close to GLUT Helvetica 10/12/18
+TEXT_FIRST_CHAR = 32                     # The atlas holds printable ASCII, ' ' to '~'
+TEXT_LAST_CHAR = 126
+TEXT_LINE_HEIGHT = 20                    # Pixels between the lines of a multi-line string
+
 # High score settings
 HIGHSCORE_FILE = "highscores.json"
 MAX_HIGHSCORES = 10  # Maximum number of high scores to keep
 
 
+################################################################################
+#                                NUMBA KERNELS                                 #
+################################################################################
+
+@njit(cache=True, boundscheck=False)
+def _collide(grid, shape, px, py, pz):
+    """
+    Return True if 'shape' (an (N, 3) int8 offset array) placed at (px, py, pz)
+    leaves the grid or overlaps a filled cell.
+    """
+    for i in range(shape.shape[0]):
+        x = px + shape[i, 0]
+        y = py + shape[i, 1]
+        z = pz + shape[i, 2]
+        # Negative coordinates wrap to huge unsigned values, so one unsigned
+        # compare per axis covers both ends of the range
+        if (np.uint32(x) >= np.uint32(grid.shape[0])
+                or np.uint32(y) >= np.uint32(grid.shape[1])
+                or np.uint32(z) >= np.uint32(grid.shape[2])):
+            return True
+        if grid[x, y, z] != 0:
+            return True
+    return False
+
+@njit(cache=True, boundscheck=False)
+def _lock_and_clear(grid, layers, shape, px, py, pz, value):
+    """
+    Write 'value' into the cells 'shape' covers at (px, py, pz) (skipping any
+    outside the grid), then remove every full Y layer, moving the layers above
+    down in a single pass. Returns the number of layers cleared.
+    'layers' holds one uint64 bitboard per Y layer (bit x * depth + z set for
+    a filled cell) and is kept in step with the grid.
+    """
+    depth = grid.shape[2]
+    for i in range(shape.shape[0]):
+        x = px + shape[i, 0]
+        y = py + shape[i, 1]
+        z = pz + shape[i, 2]
+        if 0 <= x < grid.shape[0] and 0 <= y < grid.shape[1] and 0 <= z < depth:
+            grid[x, y, z] = value
+            layers[y] |= np.uint64(1) << np.uint64(x * depth + z)
+
+    # Copy each layer that isn't full down to the next free slot
+    full = np.uint64(0xFFFFFFFFFFFFFFFF) >> np.uint64(64 - grid.shape[0] * depth)
+    write = 0
+    for y in range(grid.shape[1]):
+        if layers[y] != full:
+            if write != y:
+                grid[:, write, :] = grid[:, y, :]
+                layers[write] = layers[y]
+            write += 1
+
+    grid[:, write:, :] = 0
+    layers[write:] = 0
+    return grid.shape[1] - write
+
+def warmup_kernels():
+    """
+    Call every kernel once with the argument types the game uses, so they are
+    compiled (or loaded from Numba's cache) before play starts.
+    Returns True once each kernel has a compiled signature.
+    """
+    grid = np.zeros(GRID_SIZE, dtype=np.uint8)
+    layers = np.zeros(GRID_SIZE[1], dtype=np.uint64)
+    shape = SHAPES_3D_NP[0].copy()
+    # Piece positions are int32 arrays, so coordinates arrive as np.int32
+    pos = np.zeros(3, dtype=np.int32)
+    _collide(grid, shape, pos[0], pos[1], pos[2])
+    _lock_and_clear(grid, layers, shape, pos[0], pos[1], pos[2], 1)
+    return all(getattr(kernel, 'signatures', []) for kernel in (_collide, _lock_and_clear))
+
 ################################################################################
 #                               GAMESTATE CLASS                                #
 ################################################################################
@@ -82,13 +233,13 @@ MUSIC_VOLUME_STEP = 0.1
 
 class MusicManager:
     def __init__(self):
-        pygame.init() 
-        # Initialize mixer with high quality settings
-        pygame.mixer.pre_init(44100, -16, 2, 2048)  # CD quality audio
-        pygame.mixer.init(frequency=44100,  # Sample rate (44.1kHz - CD quality)
-                         size=-16,          # 16-bit sound
-                         channels=2,        # Stereo
-                         buffer=2048)       # Lower buffer = less latency
+        # Mixer settings must be given before pygame.init(), which opens the
+        # audio device once with them
+        pygame.mixer.pre_init(frequency=44100,  # Sample rate (44.1kHz - CD quality)
+                              size=-16,         # 16-bit sound
+                              channels=2,       # Stereo
+                              buffer=512)       # Lower buffer = less latency
+        pygame.init()
         self.volume = MUSIC_VOLUME_DEFAULT
         self.is_muted = False
         self.played_songs = []  # Track recently played songs
@@ -97,8 +248,11 @@ class MusicManager:
         self.click_sound = pygame.mixer.Sound(str(sounds_dir / "click.wav"))
         self.plop_sound = pygame.mixer.Sound(str(sounds_dir / "plop.wav"))
         
-        # Set up the end of music event
+        # Set up the end of music event. It's the only pygame event the game
+        # reads (GLUT handles input), so keep every other type out of the queue
         pygame.mixer.music.set_endevent(pygame.USEREVENT)
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(pygame.USEREVENT)
         self._load_and_play_music()
 
     def play_game_sound(self, action_type):
@@ -165,9 +319,14 @@ class MusicManager:
 class HighScoreManager:
     def __init__(self):
         self.highscores = []
+        self._formatted = None
+        # Serialized tables waiting to be written, and the thread writing them
+        self._writes = queue.Queue()
+        self._writer = None
         self.load_highscores()
 
     def load_highscores(self):
+        self._formatted = None
         try:
             if os.path.exists(HIGHSCORE_FILE):
                 with open(HIGHSCORE_FILE, 'r') as f:
@@ -176,10 +335,32 @@ class HighScoreManager:
             print(f"Error loading highscores: {e}")
             self.highscores = []
 
+    def start_writer(self):
+        """Starts the background thread that writes saved scores to disk"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
+
+    def flush(self):
+        """Waits until every saved table has been written"""
+        if self._writer is not None:
+            self._writes.join()
+
     def save_highscores(self):
+        """Queues the scores for the writer thread so game over isn't held up by disk I/O"""
+        self._writes.put(json.dumps(self.highscores, separators=(',', ':')))
+
+    def _writer_loop(self):
+        # One thread writes the tables in the order they were saved
+        while True:
+            data = self._writes.get()
+            self._write_highscores(data)
+            self._writes.task_done()
+
+    def _write_highscores(self, data):
         try:
             with open(HIGHSCORE_FILE, 'w') as f:
-                json.dump(self.highscores, f, indent=2)
+                f.write(data)
         except Exception as e:
             print(f"Error saving highscores: {e}")
 
@@ -196,6 +377,7 @@ class HighScoreManager:
             is_high_score = True
         
         if is_high_score:
+            self._formatted = None
             self.highscores.append(score_entry)
             # Sort by score (highest first)
             self.highscores.sort(key=lambda x: x["score"], reverse=True)
@@ -205,8 +387,16 @@ class HighScoreManager:
             
         return is_high_score
 
-    def get_highscores(self):
-        return self.highscores
+    def get_formatted(self, limit=MAX_HIGHSCORES):
+        """Returns the top 'limit' high scores as one string, formatted once per change"""
+        if self._formatted is None:
+            self._formatted = {}
+        text = self._formatted.get(limit)
+        if text is None:
+            text = "\n".join(f"{i+1}. {entry['score']:,} - {entry['date']}"
+                             for i, entry in enumerate(self.highscores[:limit]))
+            self._formatted[limit] = text
+        return text
 
 class GameState:
     """
@@ -214,10 +404,20 @@ class GameState:
       - last_piece (the one just locked)
       - current_piece
       - next_piece
-    The grid is a 3D array storing either None (empty) or (r, g, b) for a filled cell.
+    The grid is a (x, y, z) uint8 array storing 0 for an empty cell, or the
+    CYBER_COLORS index + 1 for a filled cell.
     """
 
     def __init__(self):
+        self.grid = np.zeros(GRID_SIZE, dtype=np.uint8)
+        # One above the highest filled cell of each (x, z) column, 0 if empty
+        self.column_heights = np.zeros((GRID_SIZE[0], GRID_SIZE[2]), dtype=np.intp)
+        # One bitboard per Y layer, bit x * depth + z set for a filled cell, so a
+        # full layer is a single compare (an 8x8 layer fits a uint64 exactly)
+        self.layer_masks = np.zeros(GRID_SIZE[1], dtype=np.uint64)
+        # Bumped whenever the grid contents change, so renderers can tell
+        # when their copy of the settled blocks is stale
+        self.grid_version = 0
         self.reset_grid()
         self.score = 0
         self.game_over = False
@@ -226,18 +426,21 @@ class GameState:
         self.next_piece = None
         self.highscore_manager = HighScoreManager()
         self.is_new_highscore = False
-        self.piece_bag = [] 
+        # Bag of shape indices handed out in shuffled rounds (see next_shape_index)
+        self._rng = np.random.default_rng()
+        self._bag = np.arange(len(SHAPES_3D), dtype=np.int8)
+        self._bag_idx = len(self._bag)
         self.music_manager = MusicManager()
+        # Scratch space for the world coordinates of a piece's blocks
+        self._cells = np.empty((MAX_PIECE_BLOCKS, 3), dtype=np.intp)
 
 
     def reset_grid(self):
-        self.grid = [
-            [
-                [None for _ in range(GRID_SIZE[2])]
-                for _ in range(GRID_SIZE[1])
-            ]
-            for _ in range(GRID_SIZE[0])
-        ]
+        # Clear in place; the grid buffer is allocated once in __init__
+        self.grid.fill(0)
+        self.column_heights.fill(0)
+        self.layer_masks.fill(0)
+        self.grid_version += 1
         self.score = 0
         self.is_new_highscore = False
 
@@ -247,50 +450,69 @@ class GameState:
         Move 'next_piece' -> 'current_piece', and generate a new 'next_piece'.
         Uses a bag system to ensure fair piece distribution.
         """
-        # Refill bag if empty
-        if not self.piece_bag:
-            self.piece_bag = list(range(len(SHAPES_3D)))
-            random.shuffle(self.piece_bag)
-        
         if self.current_piece is None:
             # This is the very beginning
-            shape_index = self.piece_bag.pop()
-            self.current_piece = Tetromino()
-            self.current_piece.shape = list(SHAPES_3D[shape_index])
-            self.current_piece.color = CYBER_COLORS[shape_index]
-            
-            shape_index = self.piece_bag.pop()
-            self.next_piece = Tetromino()
-            self.next_piece.shape = list(SHAPES_3D[shape_index])
-            self.next_piece.color = CYBER_COLORS[shape_index]
+            self.current_piece = Tetromino(self.next_shape_index())
+            self.next_piece = Tetromino(self.next_shape_index())
         else:
             self.current_piece = self.next_piece
-            shape_index = self.piece_bag.pop()
-            self.next_piece = Tetromino()
-            self.next_piece.shape = list(SHAPES_3D[shape_index])
-            self.next_piece.color = CYBER_COLORS[shape_index]
+            self.next_piece = Tetromino(self.next_shape_index())
 
         # If new piece is colliding immediately, game over
         if self.check_collision(self.current_piece.position):
             self.game_over = True
 
+    def next_shape_index(self):
+        """
+        Take the next shape index from the bag, reshuffling it in place once
+        every shape has been dealt.
+        """
+        if self._bag_idx >= len(self._bag):
+            self._rng.shuffle(self._bag)
+            self._bag_idx = 0
+        shape_index = int(self._bag[self._bag_idx])
+        self._bag_idx += 1
+        return shape_index
+
+    def reset_bag(self):
+        """Start a freshly shuffled bag on the next draw."""
+        self._bag_idx = len(self._bag)
+
     def check_collision(self, position):
         """
         Check if the current piece at 'position' goes out of bounds or hits a filled cell.
         """
-        for (ox, oy, oz) in self.current_piece.shape:
-            x = position[0] + ox
-            y = position[1] + oy
-            z = position[2] + oz
-            if x < 0 or x >= GRID_SIZE[0]:
-                return True
-            if y < 0 or y >= GRID_SIZE[1]:
-                return True
-            if z < 0 or z >= GRID_SIZE[2]:
-                return True
-            if self.grid[x][y][z] is not None:
-                return True
-        return False
+        return _collide(self.grid, self.current_piece.shape, position[0], position[1], position[2])
+
+    def update_column_heights(self):
+        """
+        Recompute 'column_heights' from the whole grid.
+        """
+        filled = self.grid != 0
+        # argmax over the flipped Y axis finds the topmost filled cell
+        tops = GRID_SIZE[1] - np.argmax(filled[:, ::-1, :], axis=1)
+        self.column_heights = np.where(filled.any(axis=1), tops, 0)
+
+    def compute_drop_distance(self, piece):
+        """
+        Return how many cells 'piece' can fall straight down before it rests
+        on the floor or on a filled cell.
+        """
+        pos = piece.position
+        if _collide(self.grid, piece.shape, pos[0], pos[1], pos[2]):
+            return 0
+
+        cells = self._cells[:len(piece.shape)]
+        np.add(piece.shape, pos, out=cells)
+        xs, ys, zs = cells[:, 0], cells[:, 1], cells[:, 2]
+        floors = self.column_heights[xs, zs]
+        if (ys < floors).any():
+            # Part of the piece slid under an overhang, so the column tops don't
+            # apply; find the highest filled cell below each block instead
+            below = (self.grid[xs, :, zs] != 0) & (np.arange(GRID_SIZE[1]) < ys[:, None])
+            floors = np.where(below.any(axis=1),
+                              GRID_SIZE[1] - np.argmax(below[:, ::-1], axis=1), 0)
+        return int((ys - floors).min())
 
     def lock_piece_and_clear(self):
         """
@@ -298,51 +520,25 @@ class GameState:
         check for completed layers, update score, set last_piece,
         then spawn new piece.
         """
-        # Lock the current piece into the grid
+        # Lock the current piece into the grid and clear full layers
         cpos = self.current_piece.position
-        ccol = self.current_piece.color
-        for (ox, oy, oz) in self.current_piece.shape:
-            x = cpos[0] + ox
-            y = cpos[1] + oy
-            z = cpos[2] + oz
-            if 0 <= x < GRID_SIZE[0] and 0 <= y < GRID_SIZE[1] and 0 <= z < GRID_SIZE[2]:
-                self.grid[x][y][z] = ccol
+        layers_cleared = _lock_and_clear(self.grid, self.layer_masks, self.current_piece.shape,
+                                         cpos[0], cpos[1], cpos[2],
+                                         self.current_piece.color_index + 1)
+        self.grid_version += 1
+        if layers_cleared:
+            # Everything above a cleared layer moved down
+            self.update_column_heights()
+        else:
+            cells = self._cells[:len(self.current_piece.shape)]
+            np.add(self.current_piece.shape, cpos, out=cells)
+            inside = ((cells >= 0) & (cells < GRID_SIZE)).all(axis=1)
+            xs, ys, zs = cells[inside].T
+            np.maximum.at(self.column_heights, (xs, zs), ys + 1)
 
         # Set last_piece reference
         self.last_piece = self.current_piece.clone()
 
-        # Check for full layers
-        layers_cleared = 0
-        y = 0
-        while y < GRID_SIZE[1]:
-            layer_full = True
-            # Check if the current layer is full
-            for x in range(GRID_SIZE[0]):
-                for z in range(GRID_SIZE[2]):
-                    if self.grid[x][y][z] is None:
-                        layer_full = False
-                        break
-                if not layer_full:
-                    break
-                    
-            if layer_full:
-                layers_cleared += 1
-                # Move all layers above down by one
-                for move_y in range(y, GRID_SIZE[1] - 1):
-                    for x in range(GRID_SIZE[0]):
-                        for z in range(GRID_SIZE[2]):
-                            self.grid[x][move_y][z] = self.grid[x][move_y + 1][z]
-                
-                # Clear the top layer
-                for x in range(GRID_SIZE[0]):
-                    for z in range(GRID_SIZE[2]):
-                        self.grid[x][GRID_SIZE[1] - 1][z] = None
-                
-                # Don't increment y since we need to check the same level again
-                # after moving everything down
-            else:
-                y += 1
-
         # Update score based on layers cleared
         if layers_cleared > 0:
             # Scoring system:
@@ -371,56 +567,69 @@ class GameState:
 class Tetromino:
     """
     A 3D Tetris piece with:
-      - shape: a list of (x,y,z) offsets
-      - position: [x,y,z]
-      - color
+      - shape: an (N, 3) int8 array of (x,y,z) offsets, looked up from the
+        shape's precomputed orientations by orient_idx (shared, don't modify)
+      - position: an int32 array [x,y,z]
+      - color, and color_index into CYBER_COLORS (what the grid stores)
     Rotation is handled via Q and E keys.
     """
 
     # Class variable to keep track of color usage
     used_colors = []
 
-    def __init__(self):
-        # Get a random shape index
-        shape_index = random.randrange(len(SHAPES_3D))
+    def __init__(self, shape_index=None):
+        # Get a random shape index unless one was given
+        if shape_index is None:
+            shape_index = random.randrange(len(SHAPES_3D))
         
         # Assign the shape and its corresponding color
-        self.shape = SHAPES_3D[shape_index]
+        self._orientations, self._turns, self._turns_back = SHAPE_ORIENTATIONS[shape_index]
+        self.orient_idx = 0
         self.color = CYBER_COLORS[shape_index]
+        self.color_index = shape_index
         
         # Set initial position
-        self.position = [GRID_SIZE[0] // 2, GRID_SIZE[1] - 3, GRID_SIZE[2] // 2]
+        self.position = np.array([GRID_SIZE[0] // 2, GRID_SIZE[1] - 3, GRID_SIZE[2] // 2],
+                                 dtype=np.int32)
+
+        # (orient_idx, offsets) last computed by preview_offsets
+        self._preview = None
+
+    @property
+    def shape(self):
+        return self._orientations[self.orient_idx]
 
     def move(self, dx, dy, dz):
-        self.position[0] += dx
-        self.position[1] += dy
-        self.position[2] += dz
+        self.position += (dx, dy, dz)
 
-    def rotate(self, axis):
+    def rotate(self, axis, direction=1):
         """
         Rotate the piece 90 degrees around the specified axis (0=x, 1=y, 2=z).
-        Uses right-hand rule for rotation direction.
+        Uses right-hand rule for rotation direction; direction=-1 turns the
+        other way.
         """
-        rotated_shape = []
-        for (x, y, z) in self.shape:
-            if axis == 0:  # Rotate around X-axis
-                rotated = (x, -z, y)
-            elif axis == 1:  # Rotate around Y-axis
-                rotated = (-z, y, x)  # Counter-clockwise around Y
-            elif axis == 2:  # Rotate around Z-axis
-                rotated = (-y, x, z)  # Counter-clockwise around Z
-            rotated_shape.append(rotated)
-        self.shape = rotated_shape
+        turns = self._turns if direction > 0 else self._turns_back
+        self.orient_idx = turns[axis][self.orient_idx]
 
 
+    def preview_offsets(self):
+        """
+        Block offsets relative to the center of the shape's bounding box, as
+        plain floats. Recomputed only after the orientation changes.
+        """
+        if self._preview is None or self._preview[0] != self.orient_idx:
+            shape = self.shape
+            center = (shape.min(axis=0) + shape.max(axis=0)) / 2.0
+            self._preview = (self.orient_idx, (shape - center).tolist())
+        return self._preview[1]
+
     def clone(self):
         """
         Simple clone: used for storing 'last_piece' reference.
         """
-        clone_piece = Tetromino()
-        clone_piece.shape = list(self.shape)
-        clone_piece.position = list(self.position)
-        clone_piece.color = self.color
+        clone_piece = Tetromino(self.color_index)
+        clone_piece.orient_idx = self.orient_idx
+        clone_piece.position = self.position.copy()
         return clone_piece
 
 ################################################################################
@@ -433,6 +642,25 @@ current_mode = STATE_LOADING
 previous_time = 0
 time_accumulator_fall = 0
 
+# Main menu demo timing (see step_demo)
+demo_accumulator = 0
+demo_action_accumulator = 0
+
+def compute_camera_basis(rot_y):
+    """
+    Return the camera's forward and right vectors on the XZ plane for a yaw
+    of 'rot_y' degrees, as (forward_x, forward_z, right_x, right_z) followed
+    by the same four rounded to the nearest grid step.
+    """
+    angle_rad = math.radians(rot_y)
+    forward_x = math.sin(angle_rad)
+    forward_z = -math.cos(angle_rad)
+    right_x = math.cos(angle_rad)
+    right_z = math.sin(angle_rad)
+    return (forward_x, forward_z, right_x, right_z,
+            int(round(forward_x)), int(round(forward_z)),
+            int(round(right_x)), int(round(right_z)))
+
 # Camera
 mouse_down = False
 mouse_last_x = 0
@@ -440,13 +668,153 @@ mouse_last_y = 0
 camera_rot_x = 25.0    # up-down rotation
 camera_rot_y = -45.0   # left-right rotation
 camera_dist = 30.0     # zoom distance
+# compute_camera_basis(camera_rot_y), refreshed whenever the camera turns
+camera_basis = compute_camera_basis(camera_rot_y)
+
+# Sideways steps queued by the movement keys since the last game_loop tick:
+# net dx, net dz, then the fallback step of the last key (see queue_move)
+pending_move = [0, 0, 0, 0]
+
+# Movement keys being held, in the order they were pressed (dict keys, values
+# unused): lower-case WASD bytes and GLUT arrow key codes. game_loop repeats
+# the most recently pressed one (see repeat_held_moves)
+keys_down = {}
+move_repeat_at = 0    # elapsed_ms() of the next repeat
 
 loading_start_time = 0
 
+# Redraw bookkeeping (see game_loop)
+window_visible = True
+scene_dirty = True      # Something changed since the last display() call
+kernels_ready = False   # Set once warmup_kernels() has run on the loading screen
+
+# Glyph atlas for 2D text (see build_text_atlas): the texture, the buffer
+# strings are streamed through, and size -> glyph metrics. TEXT_ATLAS stays
+# None without pygame.font, and text falls back to GLUT bitmap fonts.
+TEXT_ATLAS = None
+TEXT_VBO = None
+_TEXT_GLYPHS = {}
+# Laid out 2D text: (text, size) -> vertex array, ordered from least to most
+# recently used (see get_text_vertices)
+_TEXT_CACHE = {}
+
+# Display list with the static floor and back wall grid (see build_grid_list)
+GRID_DL = None
+
+# Cube geometry buffers (see init_cube_buffers), shared by draw_cube and the
+# instanced renderer. CUBE_PROGRAM stays None when the driver lacks shaders or
+# instancing, and settled blocks are drawn one by one with draw_block instead.
+CUBE_VBO = None
+CUBE_IBO = None
+GUIDE_VBO = None        # Drop indicator guide lines, refilled every frame
+INSTANCE_VBO = None
+
+# INSTANCE_VBO slots: the settled blocks followed by the current piece (at
+# most one per grid cell plus a piece), then the landing outlines
+GRID_CELLS = GRID_SIZE[0] * GRID_SIZE[1] * GRID_SIZE[2]
+INDICATOR_SLOT = GRID_CELLS + MAX_PIECE_BLOCKS
+INSTANCE_SLOTS = INDICATOR_SLOT + MAX_PIECE_BLOCKS
+CUBE_PROGRAM = None
+CUBE_UNIFORMS = {}
+# Settled blocks currently in INSTANCE_VBO, and the grid_version they match
+settled_count = 0
+settled_version = None
+
 ################################################################################
 #                                INIT OPENGL                                   #
 ################################################################################
 
+def _cube_geometry():
+    """
+    Build a unit cube centered on the origin: 24 interleaved (position, normal)
+    float32 vertices, and uint32 indices for its 12 triangles followed by its
+    12 edges as line pairs.
+    """
+    verts = []
+    for axis in range(3):
+        for sign in (-1.0, 1.0):
+            u, v = (axis + 1) % 3, (axis + 2) % 3
+            normal = [0.0, 0.0, 0.0]
+            normal[axis] = sign
+            for du, dv in ((-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5)):
+                corner = [0.0, 0.0, 0.0]
+                corner[axis] = 0.5 * sign
+                corner[u] = du
+                corner[v] = dv
+                verts.append(corner + normal)
+
+    triangles = []
+    for face in range(6):
+        b = face * 4
+        triangles += [b, b + 1, b + 2, b, b + 2, b + 3]
+
+    # Corner k of the -X face (0..3) sits opposite corner k of the +X face (4..7)
+    edges = []
+    for k in range(4):
+        edges += [k, (k + 1) % 4, 4 + k, 4 + (k + 1) % 4, k, 4 + k]
+
+    return (np.array(verts, dtype=np.float32),
+            np.array(triangles + edges, dtype=np.uint32))
+
+CUBE_VERTS, CUBE_INDICES = _cube_geometry()
+CUBE_TRI_COUNT = 36
+CUBE_EDGE_COUNT = 24
+CUBE_EDGE_OFFSET = ctypes.c_void_p(CUBE_TRI_COUNT * 4)  # byte offset into CUBE_IBO
+
+# Instanced draw passes: (edges, cube size, tint rgba, line width)
+BLOCK_PASSES = (
+    (False, BLOCK_SIZE * 0.9, (1.0, 1.0, 1.0, 1.0), None),   # Main cube slightly smaller
+    (True, BLOCK_SIZE * 0.91, (0.7, 0.7, 0.7, 1.0), 2.0),    # Darker edges for definition
+    (True, BLOCK_SIZE * 0.89, (1.2, 1.2, 1.2, 0.5), 1.0),    # Bright highlights
+)
+LANDING_PASSES = (
+    (True, BLOCK_SIZE * 0.95, (1.0, 1.0, 1.0, 0.4), 2.0),    # Landing outline
+    (True, BLOCK_SIZE * 0.85, (1.0, 1.0, 1.0, 0.2), 1.0),    # Inner wireframe for depth
+)
+
+# Instances are (cell x, cell y, cell z, color index). The shader mirrors the
+# fixed-function light set up in init_gl so instanced blocks match draw_block.
+CUBE_VERTEX_SHADER = """
+#version 120
+attribute vec3 a_position;
+attribute vec3 a_normal;
+attribute vec4 a_instance;
+uniform vec3 u_colors[7];
+uniform float u_scale;
+uniform vec4 u_tint;
+varying vec4 v_color;
+
+void main() {
+    vec4 eye = gl_ModelViewMatrix * vec4(a_instance.xyz + 0.5 + a_position * u_scale, 1.0);
+    gl_Position = gl_ProjectionMatrix * eye;
+
+    vec3 base = min(u_colors[int(a_instance.w)] * u_tint.rgb, 1.0);
+    vec3 n = normalize(gl_NormalMatrix * a_normal);
+    vec3 l = normalize(gl_LightSource[0].position.xyz - eye.xyz);
+    float diffuse = max(dot(n, l), 0.0);
+    float attenuation = 1.0 / gl_LightSource[0].constantAttenuation;
+
+    vec3 color = base * gl_LightModel.ambient.rgb
+               + base * gl_LightSource[0].diffuse.rgb * diffuse * attenuation;
+    if (diffuse > 0.0) {
+        vec3 h = normalize(l + vec3(0.0, 0.0, 1.0));
+        color += gl_FrontMaterial.specular.rgb * gl_LightSource[0].specular.rgb
+               * pow(max(dot(n, h), 0.0), gl_FrontMaterial.shininess) * attenuation;
+    }
+    v_color = vec4(color, u_tint.a);
+}
+"""
+
+CUBE_FRAGMENT_SHADER = """
+#version 120
+varying vec4 v_color;
+
+void main() {
+    gl_FragColor = v_color;
+}
+"""
+
+
 def init_gl():
     glEnable(GL_DEPTH_TEST)
     glEnable(GL_LIGHTING)
@@ -463,15 +831,217 @@ def init_gl():
     glMaterialfv(GL_FRONT, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
     glMaterialf(GL_FRONT, GL_SHININESS, 50)
     glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+    # Cubes are drawn scaled from a unit cube; keep their normals unit length
+    glEnable(GL_RESCALE_NORMAL)
+
+    build_grid_list()
+    init_cube_buffers()
+    if pygame.font.get_init():
+        build_text_atlas()
+    try:
+        init_instancing()
+    except Exception as e:
+        print(f"Instanced rendering unavailable, drawing blocks one by one: {e}")
+
+def init_cube_buffers():
+    """
+    Upload the unit cube vertices and triangle/edge indices once, and
+    allocate the buffer for the drop indicator guide lines.
+    """
+    global CUBE_VBO, CUBE_IBO, GUIDE_VBO
+    CUBE_VBO, CUBE_IBO, GUIDE_VBO = glGenBuffers(3)
+    glBindBuffer(GL_ARRAY_BUFFER, CUBE_VBO)
+    glBufferData(GL_ARRAY_BUFFER, CUBE_VERTS.nbytes, CUBE_VERTS, GL_STATIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, GUIDE_VBO)
+    glBufferData(GL_ARRAY_BUFFER, MAX_PIECE_BLOCKS * 2 * 12, None, GL_DYNAMIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, CUBE_IBO)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, CUBE_INDICES.nbytes, CUBE_INDICES, GL_STATIC_DRAW)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+def build_grid_list():
+    """
+    Compile the static floor and back wall grid lines, with their colors and
+    line width, into GRID_DL.
+    """
+    global GRID_DL
+    GRID_DL = glGenLists(1)
+    glNewList(GRID_DL, GL_COMPILE)
+
+    # Draw floor grid (slightly darker and more visible)
+    glLineWidth(1.5)  # Increased line width
+    glColor4f(0.4, 0.4, 0.8, 0.6)  # More visible grid color
+    glBegin(GL_LINES)
+    # Draw floor grid lines
+    for x in range(GRID_SIZE[0] + 1):
+        glVertex3f(x, 0, 0)
+        glVertex3f(x, 0, GRID_SIZE[2])
+    for z in range(GRID_SIZE[2] + 1):
+        glVertex3f(0, 0, z)
+        glVertex3f(GRID_SIZE[0], 0, z)
+    glEnd()
+    
+    # Draw wall grids with increased visibility
+    glColor4f(0.4, 0.4, 0.8, 0.3)  # More visible wall grid
+    glBegin(GL_LINES)
+    # Back wall
+    for x in range(GRID_SIZE[0] + 1):
+        glVertex3f(x, 0, 0)
+        glVertex3f(x, GRID_SIZE[1], 0)
+    for y in range(GRID_SIZE[1] + 1):
+        glVertex3f(0, y, 0)
+        glVertex3f(GRID_SIZE[0], y, 0)
+    glEnd()
+
+    glEndList()
+
+def _compile_shader(source, shader_type):
+    shader = glCreateShader(shader_type)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        raise RuntimeError(glGetShaderInfoLog(shader).decode())
+    return shader
+
+def init_instancing():
+    """
+    Allocate the per-instance buffer (one slot per grid cell) and build the
+    cube shader, so all settled blocks can be drawn with a few
+    glDrawElementsInstanced calls.
+    """
+    global INSTANCE_VBO, CUBE_PROGRAM, CUBE_UNIFORMS
+    if not (bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor)):
+        raise RuntimeError("glDrawElementsInstanced is not supported")
+
+    INSTANCE_VBO = glGenBuffers(1)
+    glBindBuffer(GL_ARRAY_BUFFER, INSTANCE_VBO)
+    glBufferData(GL_ARRAY_BUFFER, INSTANCE_SLOTS * 16, None, GL_DYNAMIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    program = glCreateProgram()
+    glAttachShader(program, _compile_shader(CUBE_VERTEX_SHADER, GL_VERTEX_SHADER))
+    glAttachShader(program, _compile_shader(CUBE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+    glBindAttribLocation(program, 0, "a_position")
+    glBindAttribLocation(program, 1, "a_normal")
+    glBindAttribLocation(program, 2, "a_instance")
+    glLinkProgram(program)
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        raise RuntimeError(glGetProgramInfoLog(program).decode())
+
+    CUBE_UNIFORMS = {name: glGetUniformLocation(program, name)
+                     for name in ("u_colors", "u_scale", "u_tint")}
+    glUseProgram(program)
+    glUniform3fv(CUBE_UNIFORMS["u_colors"], len(CYBER_COLORS), COLOR_TABLE)
+    glUseProgram(0)
+    CUBE_PROGRAM = program
 
 ################################################################################
 #                                   DRAWING                                    #
 ################################################################################
 
+def build_text_atlas():
+    """
+    Render the printable ASCII glyphs of every text size in white into one
+    RGBA texture, TEXT_ATLAS, one row per size. _TEXT_GLYPHS[size] records
+    each glyph's texture rect, size, x offset and advance, plus the font's
+    descent.
+    """
+    global TEXT_ATLAS, TEXT_VBO
+    chars = ''.join(chr(c) for c in range(TEXT_FIRST_CHAR, TEXT_LAST_CHAR + 1))
+    rows = []
+    for size, pixels in TEXT_FONT_SIZES.items():
+        font = pygame.font.Font(None, pixels)
+        glyphs = [font.render(c, True, (255, 255, 255)) for c in chars]
+        rows.append((size, font, glyphs, font.metrics(chars)))
+
+    # Glyphs sit 1 pixel apart so filtering never picks up a neighbour
+    width = max(sum(g.get_width() + 1 for g in glyphs) for (_, _, glyphs, _) in rows)
+    height = sum(font.get_height() + 1 for (_, font, _, _) in rows)
+    tex_w = 1 << (width - 1).bit_length()
+    tex_h = 1 << (height - 1).bit_length()
+    # White with zero alpha, so blending the glyphs in only sets alpha
+    atlas = pygame.Surface((tex_w, tex_h), pygame.SRCALPHA)
+    atlas.fill((255, 255, 255, 0))
+
+    top = 0
+    for (size, font, glyphs, metrics) in rows:
+        rects = np.empty((len(glyphs), 4), dtype=np.float32)   # u0, v0, u1, v1
+        sizes = np.empty((len(glyphs), 2), dtype=np.float32)
+        left = 0
+        for i, glyph in enumerate(glyphs):
+            w, h = glyph.get_size()
+            atlas.blit(glyph, (left, top))
+            # The atlas is uploaded bottom row first, so v runs upwards
+            rects[i] = (left / tex_w, 1 - (top + h) / tex_h,
+                        (left + w) / tex_w, 1 - top / tex_h)
+            sizes[i] = (w, h)
+            left += w + 1
+        # A glyph reaching left of the pen is rendered shifted right by that much
+        offsets = np.array([min(0, m[0]) for m in metrics], dtype=np.float32)
+        advances = np.array([m[4] for m in metrics], dtype=np.float32)
+        _TEXT_GLYPHS[size] = (rects, sizes, offsets, advances, font.get_descent())
+        top += font.get_height() + 1
+
+    TEXT_ATLAS = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, TEXT_ATLAS)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, tex_w, tex_h, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                 pygame.image.tostring(atlas, "RGBA", True))
+    glBindTexture(GL_TEXTURE_2D, 0)
+    TEXT_VBO = glGenBuffers(1)
+
+# Corners of a glyph's (x0, y0, x1, y1) rect making up its two triangles
+_QUAD_CORNERS = np.array([[0, 1], [2, 1], [2, 3], [0, 1], [2, 3], [0, 3]])
+
+def get_text_vertices(text, size):
+    """
+    Return (x, y, u, v) float32 triangle vertices, six per character, laying
+    out 'text' from the atlas with its first baseline at y = 0. Each '\n'
+    starts a line TEXT_LINE_HEIGHT lower. Characters outside the atlas show
+    as '?'. The least recently used layout is dropped once TEXT_CACHE_MAX
+    are held.
+    """
+    key = (text, size)
+    verts = _TEXT_CACHE.pop(key, None)
+    if verts is None:
+        rects, sizes, offsets, advances, descent = _TEXT_GLYPHS[size]
+        codes = []
+        quads = []
+        for line_no, line in enumerate(text.split('\n')):
+            line_codes = np.frombuffer(line.encode('ascii', 'replace'), dtype=np.uint8) - TEXT_FIRST_CHAR
+            line_codes = np.where(line_codes < len(rects), line_codes, ord('?') - TEXT_FIRST_CHAR)
+            line_quads = np.empty((len(line_codes), 4), dtype=np.float32)
+            # Pen position of each glyph: the advances of the ones before it
+            line_quads[:, 0] = np.cumsum(advances[line_codes]) - advances[line_codes]
+            line_quads[:, 0] += offsets[line_codes]
+            line_quads[:, 1] = descent - line_no * TEXT_LINE_HEIGHT
+            line_quads[:, 2:] = line_quads[:, :2] + sizes[line_codes]
+            codes.append(line_codes)
+            quads.append(line_quads)
+        codes = np.concatenate(codes)
+        quads = np.concatenate(quads)
+
+        verts = np.empty((len(codes), 6, 4), dtype=np.float32)
+        verts[:, :, :2] = quads[:, _QUAD_CORNERS]
+        verts[:, :, 2:] = rects[codes][:, _QUAD_CORNERS]
+        verts = verts.reshape(-1, 4)
+
+        if len(_TEXT_CACHE) >= TEXT_CACHE_MAX:
+            del _TEXT_CACHE[next(iter(_TEXT_CACHE))]
+
+    # Re-insert so the dict stays ordered by last use
+    _TEXT_CACHE[key] = verts
+    return verts
+
 def draw_text_2d(x, y, text, size=18, color=(1,1,1)):
     """
     Draw 2D text at (x, y) in window coords. (0,0)=bottom-left corner.
+    Lines after a '\n' are drawn TEXT_LINE_HEIGHT lower.
     """
+    if not text:
+        return
+
     glMatrixMode(GL_PROJECTION)
     glPushMatrix()
     glLoadIdentity()
@@ -482,16 +1052,45 @@ def draw_text_2d(x, y, text, size=18, color=(1,1,1)):
 
     glDisable(GL_LIGHTING)
     glColor3f(*color)
-    glRasterPos2f(x, y)
-
-    font = GLUT_BITMAP_HELVETICA_18
-    if size == 12:
-        font = GLUT_BITMAP_HELVETICA_12
-    elif size == 10:
-        font = GLUT_BITMAP_HELVETICA_10
 
-    for c in text:
-        glutBitmapCharacter(font, ord(c))
+    # GLUT only has Helvetica 10, 12 and 18; everything else uses 18
+    if size not in (10, 12):
+        size = 18
+
+    if TEXT_ATLAS is not None:
+        # The atlas holds white glyphs; the current color tints them when drawn.
+        # The whole string, every line of it, is a single draw call.
+        verts = get_text_vertices(text, size)
+        glTranslatef(x, y, 0)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, TEXT_ATLAS)
+        glBindBuffer(GL_ARRAY_BUFFER, TEXT_VBO)
+        glBufferData(GL_ARRAY_BUFFER, verts.nbytes, verts, GL_STREAM_DRAW)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 16, None)
+        glTexCoordPointer(2, GL_FLOAT, 16, ctypes.c_void_p(8))
+        glDrawArrays(GL_TRIANGLES, 0, len(verts))
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_TEXTURE_2D)
+    else:
+        font = GLUT_BITMAP_HELVETICA_18
+        if size == 12:
+            font = GLUT_BITMAP_HELVETICA_12
+        elif size == 10:
+            font = GLUT_BITMAP_HELVETICA_10
+
+        for line_no, line in enumerate(text.split('\n')):
+            glRasterPos2f(x, y - line_no * TEXT_LINE_HEIGHT)
+            if bool(glutBitmapString):
+                # freeglut: the whole line in one call
+                glutBitmapString(font, line.encode('latin-1', 'replace'))
+            else:
+                for c in line:
+                    glutBitmapCharacter(font, ord(c))
 
     glEnable(GL_LIGHTING)
     glPopMatrix()
@@ -506,40 +1105,13 @@ def draw_grid():
     glDisable(GL_LIGHTING)
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-    
-    # Draw floor grid (slightly darker and more visible)
-    glLineWidth(1.5)  # Increased line width
-    glColor4f(0.4, 0.4, 0.8, 0.6)  # More visible grid color
-    glBegin(GL_LINES)
-    # Draw floor grid lines
-    for x in range(GRID_SIZE[0] + 1):
-        glVertex3f(x, 0, 0)
-        glVertex3f(x, 0, GRID_SIZE[2])
-    for z in range(GRID_SIZE[2] + 1):
-        glVertex3f(0, 0, z)
-        glVertex3f(GRID_SIZE[0], 0, z)
-    glEnd()
-    
-    # Draw wall grids with increased visibility
-    glColor4f(0.4, 0.4, 0.8, 0.3)  # More visible wall grid
-    glBegin(GL_LINES)
-    # Back wall
-    for x in range(GRID_SIZE[0] + 1):
-        glVertex3f(x, 0, 0)
-        glVertex3f(x, GRID_SIZE[1], 0)
-    for y in range(GRID_SIZE[1] + 1):
-        glVertex3f(0, y, 0)
-        glVertex3f(GRID_SIZE[0], y, 0)
-    glEnd()
-
+    glCallList(GRID_DL)
     glEnable(GL_LIGHTING)
 
     # Draw drop indicators if we have a current piece
     if game_state.current_piece and not game_state.game_over:
         draw_drop_indicators()
 
-    glEnable(GL_LIGHTING)
-
 
 def draw_drop_indicators():
     """
@@ -548,50 +1120,44 @@ def draw_drop_indicators():
     if not game_state.current_piece:
         return
 
-    # Find landing position
-    landing_y = find_landing_position()
-    
-    # Draw vertical guide lines from piece to landing position
+    piece = game_state.current_piece
+    drop = game_state.compute_drop_distance(piece)
+    blocks = (piece.shape + piece.position).astype(np.float32)
+
+    # Draw vertical guide lines from piece to landing position, all in one draw
+    lines = np.repeat(blocks + 0.5, 2, axis=0)
+    lines[1::2, 1] -= drop
     glLineWidth(2.0)
     glColor4f(1.0, 1.0, 1.0, 0.3)  # White, semi-transparent
-    
-    cpos = game_state.current_piece.position
-    for block in game_state.current_piece.shape:
-        x = cpos[0] + block[0]
-        y = cpos[1] + block[1]
-        z = cpos[2] + block[2]
-        
-        # Draw vertical guide line
-        glBegin(GL_LINES)
-        glVertex3f(x + 0.5, y + 0.5, z + 0.5)
-        glVertex3f(x + 0.5, landing_y + block[1] + 0.5, z + 0.5)
-        glEnd()
-        
-        # Draw landing position indicator (outlined cube)
-        draw_landing_block_indicator(
-            (x, landing_y + block[1], z),
-            game_state.current_piece.color
-        )
-
-def draw_landing_block_indicator(pos, color):
-    """
-    Draw a semi-transparent outline where the block will land.
-    """
-    x, y, z = pos
-    glPushMatrix()
-    glTranslatef(x + 0.5, y + 0.5, z + 0.5)
-    
-    # Draw semi-transparent face with improved visibility
-    glColor4f(*color, 0.4)  # Increased alpha for better visibility
-    glLineWidth(2.0)  # Thicker lines
-    glutWireCube(BLOCK_SIZE * 0.95)
-    
-    # Add inner wireframe for better depth perception
-    glColor4f(*color, 0.2)
-    glLineWidth(1.0)
-    glutWireCube(BLOCK_SIZE * 0.85)
-    
-    glPopMatrix()
+    glBindBuffer(GL_ARRAY_BUFFER, GUIDE_VBO)
+    glBufferSubData(GL_ARRAY_BUFFER, 0, lines.nbytes, lines)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, None)
+    glDrawArrays(GL_LINES, 0, len(lines))
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    # Draw landing position indicators (outlined cubes)
+    landing = blocks
+    landing[:, 1] -= drop
+    if CUBE_PROGRAM is not None:
+        instances = np.empty((len(landing), 4), dtype=np.float32)
+        instances[:, :3] = landing
+        instances[:, 3] = piece.color_index
+        upload_instances(instances, INDICATOR_SLOT)
+        draw_cube_instances(INDICATOR_SLOT, len(instances), LANDING_PASSES)
+    else:
+        # One line width and color per pass rather than per block
+        bind_cube_arrays()
+        for (edges, size, tint, line_width) in LANDING_PASSES:
+            glLineWidth(line_width)
+            glColor4f(*piece.color, tint[3])
+            for (x, y, z) in landing.tolist():
+                glPushMatrix()
+                glTranslatef(x + 0.5, y + 0.5, z + 0.5)
+                draw_cube(size, edges=edges)
+                glPopMatrix()
+        unbind_cube_arrays()
 
 def find_landing_position():
     """
@@ -599,45 +1165,136 @@ def find_landing_position():
     """
     if not game_state.current_piece:
         return 0
-        
-    test_pos = list(game_state.current_piece.position)
-    while test_pos[1] > 0:
-        test_pos[1] -= 1
-        # Store current position
-        current_pos = list(game_state.current_piece.position)
-        # Temporarily move piece to test position
-        game_state.current_piece.position = test_pos
-        if game_state.check_collision(test_pos):
-            # Restore position and return the last valid Y
-            game_state.current_piece.position = current_pos
-            return test_pos[1] + 1
-        # Restore position for next iteration
-        game_state.current_piece.position = current_pos
-    return 0
-
-def draw_block(pos, color):
+    piece = game_state.current_piece
+    return piece.position[1] - game_state.compute_drop_distance(piece)
+
+def bind_cube_arrays():
+    """
+    Point the fixed-function vertex and normal arrays at the cube buffers.
+    """
+    glBindBuffer(GL_ARRAY_BUFFER, CUBE_VBO)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 24, None)
+    glNormalPointer(GL_FLOAT, 24, ctypes.c_void_p(12))
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, CUBE_IBO)
+
+def unbind_cube_arrays():
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+def draw_cube(size, edges=False):
+    """
+    Draw the cached cube scaled to 'size' around the current origin, either
+    as solid faces or as its edge lines. Expects bind_cube_arrays() first.
+    """
+    glPushMatrix()
+    glScalef(size, size, size)
+    if edges:
+        glDrawElements(GL_LINES, CUBE_EDGE_COUNT, GL_UNSIGNED_INT, CUBE_EDGE_OFFSET)
+    else:
+        glDrawElements(GL_TRIANGLES, CUBE_TRI_COUNT, GL_UNSIGNED_INT, None)
+    glPopMatrix()
+
+def draw_block(x, y, z, color_index):
     """
     Draw a single block with improved visual appearance.
+    Expects bind_cube_arrays() first.
     """
     glPushMatrix()
-    glTranslatef(pos[0] + 0.5, pos[1] + 0.5, pos[2] + 0.5)
-    
+    glTranslatef(x + 0.5, y + 0.5, z + 0.5)
+
     # Draw main cube slightly smaller
-    glColor3f(*color)
-    glutSolidCube(BLOCK_SIZE * 0.9)  # Slightly smaller cube
-    
+    glColor3f(*CYBER_COLORS[color_index])
+    draw_cube(BLOCK_SIZE * 0.9)
+
     # Draw darker edges for definition
-    glColor4f(color[0] * 0.7, color[1] * 0.7, color[2] * 0.7, 1.0)
+    glColor4f(*BLOCK_EDGE_COLORS[color_index], 1.0)
     glLineWidth(2.0)  # Thicker lines
-    glutWireCube(BLOCK_SIZE * 0.91)  # Slightly larger than the solid cube
-    
+    draw_cube(BLOCK_SIZE * 0.91, edges=True)  # Slightly larger than the solid cube
+
     # Draw bright highlights
-    glColor4f(min(color[0] * 1.2, 1.0), min(color[1] * 1.2, 1.0), min(color[2] * 1.2, 1.0), 0.5)
+    glColor4f(*BLOCK_HIGHLIGHT_COLORS[color_index], 0.5)
     glLineWidth(1.0)
-    glutWireCube(BLOCK_SIZE * 0.89)  # Slightly smaller than the solid cube
-    
+    draw_cube(BLOCK_SIZE * 0.89, edges=True)  # Slightly smaller than the solid cube
+
     glPopMatrix()
 
+def upload_instances(instances, first_slot):
+    """
+    Write an (N, 4) float32 array of (x, y, z, color index) rows into
+    INSTANCE_VBO starting at 'first_slot'.
+    """
+    glBindBuffer(GL_ARRAY_BUFFER, INSTANCE_VBO)
+    glBufferSubData(GL_ARRAY_BUFFER, first_slot * 16, instances.nbytes, instances)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+def draw_cube_instances(first_slot, count, passes):
+    """
+    Draw 'count' cubes from INSTANCE_VBO starting at 'first_slot', one
+    glDrawElementsInstanced call per pass (see BLOCK_PASSES).
+    """
+    glUseProgram(CUBE_PROGRAM)
+    glBindBuffer(GL_ARRAY_BUFFER, INSTANCE_VBO)
+    glEnableVertexAttribArray(2)
+    glVertexAttribPointer(2, 4, GL_FLOAT, GL_FALSE, 16, ctypes.c_void_p(first_slot * 16))
+    glVertexAttribDivisor(2, 1)
+
+    glBindBuffer(GL_ARRAY_BUFFER, CUBE_VBO)
+    glEnableVertexAttribArray(0)
+    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 24, None)
+    glEnableVertexAttribArray(1)
+    glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, CUBE_IBO)
+
+    for (edges, size, tint, line_width) in passes:
+        glUniform1f(CUBE_UNIFORMS["u_scale"], size)
+        glUniform4f(CUBE_UNIFORMS["u_tint"], *tint)
+        if edges:
+            glLineWidth(line_width)
+            glDrawElementsInstanced(GL_LINES, CUBE_EDGE_COUNT, GL_UNSIGNED_INT, CUBE_EDGE_OFFSET, count)
+        else:
+            glDrawElementsInstanced(GL_TRIANGLES, CUBE_TRI_COUNT, GL_UNSIGNED_INT, None, count)
+
+    glVertexAttribDivisor(2, 0)
+    for attrib in (0, 1, 2):
+        glDisableVertexAttribArray(attrib)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glUseProgram(0)
+
+def draw_blocks_instanced(piece):
+    """
+    Draw every filled grid cell plus 'piece' (if any) with the cube shader: one
+    instanced call for the solid cubes and one for each outline, however many
+    blocks have settled. The settled blocks are only re-uploaded after the
+    grid changes; the piece is written into the slots right after them.
+    """
+    global settled_count, settled_version
+    if settled_version != game_state.grid_version:
+        grid = game_state.grid
+        cells = np.argwhere(grid)
+        if len(cells):
+            instances = np.empty((len(cells), 4), dtype=np.float32)
+            instances[:, :3] = cells
+            instances[:, 3] = grid[cells[:, 0], cells[:, 1], cells[:, 2]] - 1
+            upload_instances(instances, 0)
+        settled_count = len(cells)
+        settled_version = game_state.grid_version
+
+    count = settled_count
+    if piece is not None:
+        instances = np.empty((len(piece.shape), 4), dtype=np.float32)
+        instances[:, :3] = piece.shape + piece.position
+        instances[:, 3] = piece.color_index
+        upload_instances(instances, count)
+        count += len(instances)
+
+    if count:
+        draw_cube_instances(0, count, BLOCK_PASSES)
+
 def draw_scene_3d():
     """
     Draw the main Tetris scene in 3D (grid, blocks, current piece).
@@ -648,23 +1305,29 @@ def draw_scene_3d():
     # Draw the grid lines
     draw_grid()
 
-    # Draw settled blocks
-    for x in range(GRID_SIZE[0]):
-        for y in range(GRID_SIZE[1]):
-            for z in range(GRID_SIZE[2]):
-                cell_color = game_state.grid[x][y][z]
-                if cell_color is not None:
-                    draw_block((x, y, z), cell_color)
+    # The current piece is drawn with the settled blocks, unless the game is over
+    piece = game_state.current_piece
+    if game_state.game_over:
+        piece = None
 
-    # Draw the current piece if present (and not game over, though we can keep showing it)
-    if game_state.current_piece and not game_state.game_over:
-        cpos = game_state.current_piece.position
-        ccol = game_state.current_piece.color
-        for (ox, oy, oz) in game_state.current_piece.shape:
-            bx = cpos[0] + ox
-            by = cpos[1] + oy
-            bz = cpos[2] + oz
-            draw_block((bx, by, bz), ccol)
+    # Draw settled blocks (only the non-empty cells) and the current piece
+    if CUBE_PROGRAM is not None:
+        draw_blocks_instanced(piece)
+        return
+
+    # No instancing: one draw_block per settled block. argwhere and the
+    # boolean mask both walk the grid in C order, so cells and colors line up,
+    # and tolist hands the loop plain ints.
+    grid = game_state.grid
+    cells = np.argwhere(grid).tolist()
+    color_indices = (grid[grid != 0] - 1).tolist()
+    bind_cube_arrays()
+    for (x, y, z), color_index in zip(cells, color_indices):
+        draw_block(x, y, z, color_index)
+    if piece is not None:
+        for (x, y, z) in (piece.shape + piece.position).tolist():
+            draw_block(x, y, z, piece.color_index)
+    unbind_cube_arrays()
 
 def draw_piece_preview(piece, x_viewport, y_viewport, w_viewport, h_viewport, label):
     """
@@ -694,27 +1357,15 @@ def draw_piece_preview(piece, x_viewport, y_viewport, w_viewport, h_viewport, la
     glRotatef(30, 1, 0, 0)
     glRotatef(-30, 0, 1, 0)
 
-    # Draw the piece in a small bounding box
-    # Center it by finding the shape's bounds
-    xs = [b[0] for b in piece.shape]
-    ys = [b[1] for b in piece.shape]
-    zs = [b[2] for b in piece.shape]
-    minx, maxx = min(xs), max(xs)
-    miny, maxy = min(ys), max(ys)
-    minz, maxz = min(zs), max(zs)
-    cx = (minx + maxx) / 2.0
-    cy = (miny + maxy) / 2.0
-    cz = (minz + maxz) / 2.0
-
-    for (ox, oy, oz) in piece.shape:
-        bx = ox - cx
-        by = oy - cy
-        bz = oz - cz
+    # Draw the piece centered on its bounding box, all in the piece's color
+    glColor3f(*piece.color)
+    bind_cube_arrays()
+    for (bx, by, bz) in piece.preview_offsets():
         glPushMatrix()
         glTranslatef(bx, by, bz)
-        glColor3f(*piece.color)
-        glutSolidCube(0.9)  # Slightly smaller cubes
+        draw_cube(0.9)  # Slightly smaller cubes
         glPopMatrix()
+    unbind_cube_arrays()
 
     # Reset back to main viewport
     glPopMatrix()
@@ -730,6 +1381,8 @@ def display():
     """
     GLUT display function.
     """
+    global scene_dirty
+
     glClearColor(0.05, 0.05, 0.1, 1.0)
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
@@ -750,7 +1403,7 @@ def display():
 
     # 2D overlays or separate screens:
     if current_mode == STATE_LOADING:
-        elapsed = glutGet(GLUT_ELAPSED_TIME) - loading_start_time
+        elapsed = elapsed_ms() - loading_start_time
         # Animate the LOADING text color
         r = abs(math.sin(elapsed * 0.005))
         g = abs(math.sin(elapsed * 0.003 + 2))
@@ -759,50 +1412,9 @@ def display():
         draw_text_2d(100, 260, "Press ENTER to skip", 12, TEXT_COLOR)
 
     elif current_mode == STATE_MAIN_MENU:
-        # Setup demo game if needed
-        if not game_state.current_piece:
-            game_state.reset_grid()
-            game_state.piece_bag = list(range(len(SHAPES_3D)))
-            random.shuffle(game_state.piece_bag)
-            game_state.spawn_new_piece()
-            game_state.game_over = False
-        
-        # Demo gameplay
-        if game_state.current_piece:
-            # Make random moves
-            if random.random() < 0.02:
-                move = random.choice(['move', 'rotate', 'drop'])
-                if move == 'move':
-                    direction = random.choice([(1,0,0), (-1,0,0), (0,0,1), (0,0,-1)])
-                    game_state.current_piece.move(*direction)
-                    if game_state.check_collision(game_state.current_piece.position):
-                        game_state.current_piece.move(-direction[0], 0, -direction[2])
-                elif move == 'rotate':
-                    game_state.current_piece.rotate(random.choice([0,1,2]))
-                elif move == 'drop':
-                    while not game_state.check_collision(game_state.current_piece.position):
-                        game_state.current_piece.move(0, -1, 0)
-                    game_state.current_piece.move(0, 1, 0)
-                    game_state.lock_piece_and_clear()
-
-            # Normal falling
-            if glutGet(GLUT_ELAPSED_TIME) % 500 < 16:
-                old_pos = list(game_state.current_piece.position)
-                game_state.current_piece.move(0, -1, 0)
-                if game_state.check_collision(game_state.current_piece.position):
-                    game_state.current_piece.position = old_pos
-                    game_state.lock_piece_and_clear()
-
-            # Reset if game over
-            if game_state.game_over:
-                game_state.reset_grid()
-                game_state.piece_bag = list(range(len(SHAPES_3D)))
-                random.shuffle(game_state.piece_bag)
-                game_state.spawn_new_piece()
-                game_state.game_over = False
-
         # Auto-rotate camera
-        glRotatef(glutGet(GLUT_ELAPSED_TIME) * 0.01, 0, 1, 0)
+        # Wrapped to one turn so the angle stays small enough for float precision
+        glRotatef(elapsed_ms() % 36000 * 0.01, 0, 1, 0)
 
         # Draw the game scene
         draw_scene_3d()
@@ -814,9 +1426,7 @@ def display():
 
         # Draw high scores
         draw_text_2d(100, 280, "HIGH SCORES:", 14, (1.0, 0.8, 0.2))
-        for i, entry in enumerate(game_state.highscore_manager.get_highscores()):
-            score_text = f"{i+1}. {entry['score']:,} - {entry['date']}"
-            draw_text_2d(100, 250 - (i * 20), score_text, 12, TEXT_COLOR)
+        draw_text_2d(100, 250, game_state.highscore_manager.get_formatted(), 12, TEXT_COLOR)
 
     elif current_mode == STATE_PLAYING:
         score_str = f"SCORE: {game_state.score}"
@@ -861,13 +1471,13 @@ def display():
         
         # Display high scores
         draw_text_2d(300, 280, "HIGH SCORES:", 14, (1.0, 0.8, 0.2))
-        for i, entry in enumerate(game_state.highscore_manager.get_highscores()[:5]):  # Show top 5 in game over
-            score_text = f"{i+1}. {entry['score']:,} - {entry['date']}"
-            draw_text_2d(300, 250 - (i * 20), score_text, 12, TEXT_COLOR)
+        top_five = game_state.highscore_manager.get_formatted(5)  # Show top 5 in game over
+        draw_text_2d(300, 250, top_five, 12, TEXT_COLOR)
             
         draw_text_2d(250, 120, "[R] Restart   [ESC] Main Menu", 14, TEXT_COLOR)
 
 
+    scene_dirty = False
     glutSwapBuffers()
 
 ################################################################################
@@ -875,13 +1485,16 @@ def display():
 ################################################################################
 
 def set_mode(new_mode):
-    global current_mode
-    print(f"Setting mode from {current_mode} to {new_mode}")  # Debug print
+    global current_mode, scene_dirty, loading_start_time
+    if DEBUG:
+        print(f"Setting mode from {current_mode} to {new_mode}")
     current_mode = new_mode
+    scene_dirty = True
+    clear_move_input()
     if new_mode == STATE_GAME_OVER:
         game_state.is_new_highscore = game_state.highscore_manager.add_score(game_state.score)
     elif new_mode == STATE_LOADING:
-        loading_start_time = glutGet(GLUT_ELAPSED_TIME)
+        loading_start_time = elapsed_ms()
     elif new_mode == STATE_MAIN_MENU:
         game_state.reset_grid()
         game_state.score = 0
@@ -908,199 +1521,141 @@ def reshape(w, h):
     glLoadIdentity()
 
 
+def _toggle_pause(key):
+    global current_mode
+    if current_mode == STATE_PLAYING:
+        current_mode = STATE_PAUSED
+    else:
+        current_mode = STATE_PLAYING
+    clear_move_input()
+    return True
+
+def _to_main_menu(key):
+    set_mode(STATE_MAIN_MENU)
+    return True
+
+def _quit(key):
+    sys.exit(0)
+
+def _skip_loading(key):
+    global kernels_ready, previous_time
+    if not kernels_ready:
+        kernels_ready = warmup_kernels()
+        # Don't let the compile time leak into the next frame's delta
+        previous_time = elapsed_ms()
+    set_mode(STATE_MAIN_MENU)
+    return True
+
+def _start_game(key):
+    # Reset game state
+    game_state.reset_grid()
+    game_state.game_over = False
+    game_state.current_piece = None
+    game_state.next_piece = None
+    game_state.spawn_new_piece()
+    set_mode(STATE_PLAYING)
+    return True
+
+def _hard_drop(key):
+    piece = game_state.current_piece
+    piece.position[1] -= game_state.compute_drop_distance(piece)
+    game_state.lock_piece_and_clear()
+    if game_state.game_over:
+        set_mode(STATE_GAME_OVER)
+    return True
+
+def _move_key(key):
+    # Queued; game_loop redraws once the move is applied
+    press_move_key(key.lower())
+    return False
+
+def _rotate_piece(axis, direction=1):
+    """
+    Rotate the current piece, keeping the old orientation if the new one
+    collides. Returns True if the piece turned.
+    """
+    piece = game_state.current_piece
+    original_orient = piece.orient_idx
+    piece.rotate(axis, direction)
+    if piece.orient_idx == original_orient:
+        return False
+    if game_state.check_collision(piece.position):
+        # Restore original orientation if collision occurs
+        piece.orient_idx = original_orient
+        return False
+    return True
+
+# Key handlers for each mode, looked up by the upper-cased key. Each takes
+# the key and returns True if the screen needs redrawing.
+_PLAYING_HANDLERS = {
+    b' ': _hard_drop,
+    # Single counter-clockwise rotation around Y axis
+    b'Q': lambda key: _rotate_piece(1),
+    # Single clockwise rotation around Y axis
+    b'E': lambda key: _rotate_piece(1, direction=-1),
+    # Single clockwise rotation around Z axis
+    b'R': lambda key: _rotate_piece(2),
+    b'W': _move_key,
+    b'A': _move_key,
+    b'S': _move_key,
+    b'D': _move_key,
+    b'P': _toggle_pause,
+    b'\x1b': _to_main_menu,
+}
+_KEY_HANDLERS = {
+    STATE_LOADING: {b'\r': _skip_loading, b'\x1b': _quit},
+    STATE_MAIN_MENU: {b'S': _start_game, b'\x1b': _quit},
+    STATE_PLAYING: _PLAYING_HANDLERS,
+    STATE_PAUSED: {b'P': _toggle_pause, b'\x1b': _to_main_menu},
+    STATE_GAME_OVER: {b'R': _start_game, b'\x1b': _to_main_menu},
+}
+# Music keys work on every screen and never change what's drawn
+_MUSIC_HANDLERS = {
+    b'M': lambda key: game_state.music_manager.toggle_mute(),
+    b'6': lambda key: game_state.music_manager.adjust_volume(False),
+    b'7': lambda key: game_state.music_manager.adjust_volume(True),
+    b'8': lambda key: game_state.music_manager.next_song(),
+}
+
 def keyboard(key, x, y):
     """
-    Update keyboard handler to use improved WASD movement and consistent rotations.
+    Keyboard handler: looks the key up, case-insensitively, in the current
+    mode's handlers and then the music keys.
     Q: Always rotates counter-clockwise around Y axis
     E: Always rotates clockwise around Y axis
     R: Always rotates clockwise around Z axis
     """
-    global current_mode, camera_dist
-
-    # Handle pause state changes
-    if key in (b'p', b'P'):
-        if current_mode == STATE_PLAYING:
-            current_mode = STATE_PAUSED
-            glutPostRedisplay()
-            return
-        elif current_mode == STATE_PAUSED:
-            current_mode = STATE_PLAYING
-            glutPostRedisplay()
-            return
-
-    if key == b'm':  # Toggle music
-        game_state.music_manager.toggle_mute()
-    elif key == b'6':  # Volume down
-        game_state.music_manager.adjust_volume(False)
-    elif key == b'7':  # Volume up
-        game_state.music_manager.adjust_volume(True)
-    elif key == b'8':  # Skip to next song
-        game_state.music_manager.next_song()
-
-    glutPostRedisplay()
-
-    # Handle space bar for hard drop - MOVED THIS SECTION BEFORE THE WASD CHECK
-    if current_mode == STATE_PLAYING and not game_state.game_over and key == b' ':
-        if game_state.current_piece:
-            # Keep moving down until collision
-            while True:
-                old_pos = list(game_state.current_piece.position)
-                game_state.current_piece.move(0, -1, 0)
-                if game_state.check_collision(game_state.current_piece.position):
-                    game_state.current_piece.position = old_pos
-                    game_state.lock_piece_and_clear()
-                    break
-            glutPostRedisplay()
-            return
-
-    # Handle WASD movement if in playing state
-    if current_mode == STATE_PLAYING and not game_state.game_over and game_state.current_piece:
-        if key in (b'w', b'W', b'a', b'A', b's', b'S', b'd', b'D'):
-            handle_wasd(key)
-            glutPostRedisplay()
-            return
-
-        # Store original state before any rotation
-        original_position = list(game_state.current_piece.position)
-        original_shape = [list(block) for block in game_state.current_piece.shape]
-
-        # Handle rotations
-        if key in (b'q', b'Q'):
-            # Single counter-clockwise rotation around Y axis
-            game_state.current_piece.rotate(axis=1)
-            if game_state.check_collision(game_state.current_piece.position):
-                # Restore original state if collision occurs
-                game_state.current_piece.position = original_position
-                game_state.current_piece.shape = [tuple(block) for block in original_shape]
-                
-        elif key in (b'e', b'E'):
-            # Single clockwise rotation around Y axis (three counter-clockwise rotations)
-            for _ in range(3):
-                game_state.current_piece.rotate(axis=1)
-            if game_state.check_collision(game_state.current_piece.position):
-                # Restore original state if collision occurs
-                game_state.current_piece.position = original_position
-                game_state.current_piece.shape = [tuple(block) for block in original_shape]
-                
-        elif key in (b'r', b'R'):
-            # Single clockwise rotation around Z axis
-            game_state.current_piece.rotate(axis=2)
-            if game_state.check_collision(game_state.current_piece.position):
-                # Restore original state if collision occurs
-                game_state.current_piece.position = original_position
-                game_state.current_piece.shape = [tuple(block) for block in original_shape]
-
+    key = key.upper()
+    if current_mode == STATE_PLAYING and game_state.game_over:
+        # The last piece couldn't spawn; show the game over screen
+        set_mode(STATE_GAME_OVER)
         glutPostRedisplay()
         return
 
-    # ESC: either quit or go back to main menu
-    if key == b'\x1b':  # ESC
-        if current_mode in (STATE_PLAYING, STATE_PAUSED, STATE_GAME_OVER):
-            set_mode(STATE_MAIN_MENU)
-        elif current_mode == STATE_MAIN_MENU:
-            sys.exit(0)
-        else:
-            sys.exit(0)
-        return
-
-    if current_mode == STATE_LOADING:
-        if key == b'\r':  # ENTER
-            set_mode(STATE_MAIN_MENU)
-
-    elif current_mode == STATE_MAIN_MENU:
-        if key in (b's', b'S'):
-            game_state.reset_grid()
-            game_state.score = 0
-            game_state.game_over = False
-            game_state.current_piece = None
-            game_state.next_piece = None
-            game_state.spawn_new_piece()
-            set_mode(STATE_PLAYING)
-
-
-    elif current_mode == STATE_PLAYING:
-        if game_state.game_over:
-            set_mode(STATE_GAME_OVER)
-            return
-
-    elif current_mode == STATE_GAME_OVER:
-        if key in (b'r', b'R'):
-            # Reset game state
-            game_state.reset_grid()
-            game_state.score = 0
-            game_state.game_over = False
-            game_state.current_piece = None
-            game_state.next_piece = None
-            game_state.spawn_new_piece()
-            game_state.is_new_highscore = False
-            set_mode(STATE_PLAYING)
-
-    glutPostRedisplay()
+    handler = _KEY_HANDLERS[current_mode].get(key) or _MUSIC_HANDLERS.get(key)
+    # Redisplay once, and only if the handler changed what's on screen
+    if handler is not None and handler(key):
+        glutPostRedisplay()
 
-def special_input(key, x, y):
+def special_keys(key, x, y):
     """
-    Handle special keys like WASD for movement.
+    Handle the arrow keys for movement.
     """
     if current_mode == STATE_PLAYING and not game_state.game_over and game_state.current_piece:
-        # Calculate movement relative to camera orientation
-        # Compute forward and right vectors based on camera_rot_y
-        angle_rad = math.radians(camera_rot_y)
-        forward_x = math.sin(angle_rad)
-        forward_z = -math.cos(angle_rad)
-        right_x = math.cos(angle_rad)
-        right_z = math.sin(angle_rad)
-
-        move_x, move_z = 0, 0
-
-        if key == GLUT_KEY_UP or key == GLUT_KEY_RIGHT:
-            pass  # Not used, since we're using WASD
-        elif key == GLUT_KEY_DOWN or key == GLUT_KEY_LEFT:
-            pass  # Not used, since we're using WASD
-
-        # WASD mapping
-        # Retrieve the last pressed key to handle continuous movement if desired
-        # For simplicity, we'll handle discrete movement per key press
+        if key in (GLUT_KEY_UP, GLUT_KEY_DOWN, GLUT_KEY_LEFT, GLUT_KEY_RIGHT):
+            press_move_key(key)
 
-    glutPostRedisplay()
-
-def special_keys(key, x, y):
+def keyboard_up(key, x, y):
     """
-    Handle WASD keys for movement.
+    Stop repeating a released WASD key.
     """
-    if current_mode == STATE_PLAYING and not game_state.game_over and game_state.current_piece:
-        angle_rad = math.radians(camera_rot_y)
-        forward_x = math.sin(angle_rad)
-        forward_z = -math.cos(angle_rad)
-        right_x = math.cos(angle_rad)
-        right_z = math.sin(angle_rad)
-
-        move_x, move_z = 0, 0
-
-        if key in (GLUT_KEY_F1,):  # Not used
-            pass
-        # WASD keys
-        elif key == GLUT_KEY_UP:
-            # Equivalent to 'W'
-            game_state.current_piece.move(int(round(forward_x)), 0, int(round(forward_z)))
-            if game_state.check_collision(game_state.current_piece.position):
-                game_state.current_piece.move(-int(round(forward_x)), 0, -int(round(forward_z)))
-        elif key == GLUT_KEY_DOWN:
-            # Equivalent to 'S'
-            game_state.current_piece.move(-int(round(forward_x)), 0, -int(round(forward_z)))
-            if game_state.check_collision(game_state.current_piece.position):
-                game_state.current_piece.move(int(round(forward_x)), 0, int(round(forward_z)))
-        elif key == GLUT_KEY_LEFT:
-            # Equivalent to 'A'
-            game_state.current_piece.move(-int(round(right_x)), 0, -int(round(right_z)))
-            if game_state.check_collision(game_state.current_piece.position):
-                game_state.current_piece.move(int(round(right_x)), 0, int(round(right_z)))
-        elif key == GLUT_KEY_RIGHT:
-            # Equivalent to 'D'
-            game_state.current_piece.move(int(round(right_x)), 0, int(round(right_z)))
-            if game_state.check_collision(game_state.current_piece.position):
-                game_state.current_piece.move(-int(round(right_x)), 0, -int(round(right_z)))
+    keys_down.pop(key.lower(), None)
 
-    glutPostRedisplay()
+def special_keys_up(key, x, y):
+    """
+    Stop repeating a released arrow key.
+    """
+    keys_down.pop(key, None)
 
 def mouse_click(button, state, x, y):
     """
@@ -1129,12 +1684,13 @@ def mouse_motion(x, y):
     Handle mouse dragging for camera rotation.
     """
     global mouse_down, mouse_last_x, mouse_last_y
-    global camera_rot_x, camera_rot_y
+    global camera_rot_x, camera_rot_y, camera_basis
 
     if mouse_down:
         dx = x - mouse_last_x
         dy = y - mouse_last_y
         camera_rot_y += dx * 0.3
+        camera_basis = compute_camera_basis(camera_rot_y)
         camera_rot_x += dy * 0.3
         # Clamp vertical rotation
         if camera_rot_x > 90:
@@ -1145,6 +1701,15 @@ def mouse_motion(x, y):
         mouse_last_y = y
         glutPostRedisplay()
 
+def visibility(state):
+    """
+    Track whether the window can be seen (e.g. not minimized).
+    """
+    global window_visible
+    window_visible = (state == GLUT_VISIBLE)
+    if window_visible:
+        glutPostRedisplay()
+
 def mouse_wheel(button, direction, x, y):
     """
     Handle mouse wheel for zooming in and out.
@@ -1165,16 +1730,15 @@ def mouse_wheel(button, direction, x, y):
 ################################################################################
 
 def game_loop(value):
-    global previous_time, time_accumulator_fall
+    global previous_time, time_accumulator_fall, kernels_ready, scene_dirty
 
-    current_time = glutGet(GLUT_ELAPSED_TIME)
+    current_time = elapsed_ms()
     delta_time = current_time - previous_time
     previous_time = current_time
 
     # Always process music events regardless of game state
-    for event in pygame.event.get():
-        if event.type == pygame.USEREVENT:  # Music ended
-            game_state.music_manager.next_song()
+    for _ in pygame.event.get(pygame.USEREVENT):  # Music ended
+        game_state.music_manager.next_song()
             
     # Auto-advance to next song when current song ends
     if not pygame.mixer.music.get_busy():
@@ -1182,60 +1746,110 @@ def game_loop(value):
 
     # Only process game updates if in PLAYING state (not paused or other states)
     if current_mode == STATE_PLAYING and not game_state.game_over:
+        # Movement keys pressed or held since the last tick, as a single move
+        repeat_held_moves(current_time)
+        apply_pending_move()
+
         time_accumulator_fall += delta_time
         if time_accumulator_fall >= FALL_INTERVAL_MS:
             time_accumulator_fall -= FALL_INTERVAL_MS
             if game_state.current_piece:  # Add safety check
+                scene_dirty = True
                 # Move piece down
-                old_pos = list(game_state.current_piece.position)
-                game_state.current_piece.move(0, -1, 0)
-                if game_state.check_collision(game_state.current_piece.position):
-                    game_state.current_piece.position = old_pos
+                piece = game_state.current_piece
+                piece.position[1] -= 1
+                if game_state.check_collision(piece.position):
+                    piece.position[1] += 1
                     game_state.lock_piece_and_clear()
                     if game_state.game_over:
                         set_mode(STATE_GAME_OVER)
 
-    glutPostRedisplay()
+    elif current_mode == STATE_MAIN_MENU:
+        step_demo(delta_time)
+
+    elif current_mode == STATE_LOADING and not kernels_ready:
+        # Compile the Numba kernels while the loading screen is up
+        kernels_ready = warmup_kernels()
+        previous_time = elapsed_ms()
+
+    # Nothing to draw while minimized/hidden; other screens are redrawn by
+    # input handlers and GLUT, or once the scene was marked dirty
+    if window_visible and (current_mode in ANIMATED_MODES or scene_dirty):
+        glutPostRedisplay()
     glutTimerFunc(16, game_loop, 0)
 
+def reset_demo():
+    game_state.reset_grid()
+    game_state.reset_bag()
+    game_state.spawn_new_piece()
+    game_state.game_over = False
+
+def step_demo(delta_time):
+    """
+    Advance the main menu's self-playing demo by 'delta_time' milliseconds.
+    Moves and falls run on fixed intervals, independent of the frame rate.
+    """
+    global demo_accumulator, demo_action_accumulator
+
+    # Setup demo game if needed
+    if not game_state.current_piece:
+        reset_demo()
+
+    # Make a random move
+    demo_action_accumulator += delta_time
+    if demo_action_accumulator >= DEMO_ACTION_INTERVAL_MS:
+        demo_action_accumulator = 0
+        move = random.choice(['move', 'rotate', 'drop'])
+        if move == 'move':
+            direction = random.choice([(1,0,0), (-1,0,0), (0,0,1), (0,0,-1)])
+            game_state.current_piece.move(*direction)
+            if game_state.check_collision(game_state.current_piece.position):
+                game_state.current_piece.move(-direction[0], 0, -direction[2])
+        elif move == 'rotate':
+            game_state.current_piece.rotate(random.choice([0,1,2]))
+        elif move == 'drop':
+            piece = game_state.current_piece
+            piece.position[1] -= game_state.compute_drop_distance(piece)
+            game_state.lock_piece_and_clear()
+
+    # Normal falling
+    demo_accumulator += delta_time
+    while demo_accumulator >= FALL_INTERVAL_MS and not game_state.game_over:
+        demo_accumulator -= FALL_INTERVAL_MS
+        piece = game_state.current_piece
+        piece.position[1] -= 1
+        if game_state.check_collision(piece.position):
+            piece.position[1] += 1
+            game_state.lock_piece_and_clear()
+
+    # Reset if game over
+    if game_state.game_over:
+        demo_accumulator = 0
+        reset_demo()
+
 ################################################################################
 #                                HELPERS                                       #
 ################################################################################
 
-def handle_wasd(key):
+def elapsed_ms():
     """
-    Handle WASD key presses for movement relative to camera perspective.
-    Uses camera angle to determine the most intuitive movement direction.
+    Milliseconds on a monotonic clock, read in Python instead of through a
+    glutGet(GLUT_ELAPSED_TIME) call. Only differences between readings matter.
     """
-    if current_mode != STATE_PLAYING or game_state.game_over or not game_state.current_piece:
-        return
-
-    # Calculate movement direction based on camera orientation
-    angle_rad = math.radians(camera_rot_y)
-    
-    # Calculate primary and secondary movement vectors based on camera angle
-    # This creates 8 movement sectors for more intuitive control
-    forward_x = math.sin(angle_rad)
-    forward_z = -math.cos(angle_rad)
-    right_x = math.cos(angle_rad)
-    right_z = math.sin(angle_rad)
+    return time.perf_counter_ns() // 1_000_000
 
-    # Normalize the movement vectors
-    length = math.sqrt(forward_x * forward_x + forward_z * forward_z)
-    if length != 0:
-        forward_x /= length
-        forward_z /= length
-    
-    length = math.sqrt(right_x * right_x + right_z * right_z)
-    if length != 0:
-        right_x /= length
-        right_z /= length
+def wasd_direction(key, rot_y):
+    """
+    Work out the grid step for WASD 'key' with the camera turned 'rot_y'
+    degrees: (move_x, move_z) snapped to the dominant direction, and
+    (alt_move_x, alt_move_z) to try when that step is blocked.
+    """
+    forward_x, forward_z, right_x, right_z = compute_camera_basis(rot_y)[:4]
 
     # Determine the dominant direction based on camera angle
     # This helps snap movement to the closest grid direction
     move_x, move_z = 0, 0
-    
-    key = key.lower()
+
     if key == b'w':  # Forward
         # Use the dominant direction for more intuitive forward movement
         if abs(forward_x) > abs(forward_z):
@@ -1261,22 +1875,138 @@ def handle_wasd(key):
         else:
             move_z = 1 if right_z > 0 else -1
 
-    # Try to move the piece
-    if move_x != 0 or move_z != 0:
-        # First try the primary movement direction
-        game_state.current_piece.move(move_x, 0, move_z)
-        if game_state.check_collision(game_state.current_piece.position):
-            # If primary movement fails, revert and try alternative direction
-            game_state.current_piece.move(-move_x, 0, -move_z)
-            
-            # Try alternative movement based on secondary vector component
-            alt_move_x = 0 if move_x != 0 else (1 if forward_x > 0 else -1)
-            alt_move_z = 0 if move_z != 0 else (1 if forward_z > 0 else -1)
-            
-            game_state.current_piece.move(alt_move_x, 0, alt_move_z)
-            if game_state.check_collision(game_state.current_piece.position):
-                # If alternative also fails, revert
-                game_state.current_piece.move(-alt_move_x, 0, -alt_move_z)
+    # Alternative movement based on secondary vector component
+    alt_move_x = 0 if move_x != 0 else (1 if forward_x > 0 else -1)
+    alt_move_z = 0 if move_z != 0 else (1 if forward_z > 0 else -1)
+    return (move_x, move_z, alt_move_x, alt_move_z)
+
+# The dominant axes and their signs only change at multiples of 45 degrees,
+# so each 45 degree sector of camera yaw has one fixed set of WASD steps:
+# WASD_DIRECTIONS[sector][key], worked out at the middle of the sector
+WASD_DIRECTIONS = tuple(
+    {key: wasd_direction(key, sector * 45 + 22.5) for key in (b'w', b'a', b's', b'd')}
+    for sector in range(8)
+)
+
+def handle_wasd(key):
+    """
+    Handle WASD key presses for movement relative to camera perspective.
+    Uses camera angle to determine the most intuitive movement direction.
+    """
+    if current_mode != STATE_PLAYING or game_state.game_over or not game_state.current_piece:
+        return
+
+    # The % 8 catches a tiny negative angle, which rounds up to 360
+    sector = int(camera_rot_y % 360 // 45) % 8
+    queue_move(*WASD_DIRECTIONS[sector][key.lower()])
+
+def handle_arrow_key(key):
+    """
+    Handle an arrow key press: a step along the camera's forward or right
+    vector, rounded to the grid.
+    """
+    forward_x, forward_z, right_x, right_z = camera_basis[4:]
+    if key == GLUT_KEY_UP:
+        # Equivalent to 'W'
+        queue_move(forward_x, forward_z)
+    elif key == GLUT_KEY_DOWN:
+        # Equivalent to 'S'
+        queue_move(-forward_x, -forward_z)
+    elif key == GLUT_KEY_LEFT:
+        # Equivalent to 'A'
+        queue_move(-right_x, -right_z)
+    elif key == GLUT_KEY_RIGHT:
+        # Equivalent to 'D'
+        queue_move(right_x, right_z)
+
+def handle_move_key(key):
+    """
+    Queue the move for a WASD byte or a GLUT arrow key code.
+    """
+    if isinstance(key, bytes):
+        handle_wasd(key)
+    else:
+        handle_arrow_key(key)
+
+def clear_move_input():
+    """
+    Forget held movement keys and any queued step, so neither carries over
+    into a pause or a new game.
+    """
+    keys_down.clear()
+    pending_move[:] = (0, 0, 0, 0)
+
+def press_move_key(key):
+    """
+    Move for a newly pressed WASD or arrow key, and hold it in 'keys_down'
+    so game_loop keeps repeating the move until the key is released.
+    """
+    global move_repeat_at
+    # Re-insert so the newest press is last
+    keys_down.pop(key, None)
+    keys_down[key] = None
+    move_repeat_at = elapsed_ms() + MOVE_REPEAT_DELAY_MS
+    handle_move_key(key)
+
+def repeat_held_moves(now):
+    """
+    Once the repeat delay has passed, move again for the most recently pressed
+    movement key that is still held, every MOVE_REPEAT_MS, like OS key repeat.
+    """
+    global move_repeat_at
+    if not keys_down or now < move_repeat_at:
+        return
+    move_repeat_at = now + MOVE_REPEAT_MS
+    handle_move_key(next(reversed(keys_down)))
+
+def queue_move(move_x, move_z, alt_move_x=0, alt_move_z=0):
+    """
+    Add a sideways step to 'pending_move' for the next game_loop tick, with
+    the alternative step to try if the move is blocked.
+    """
+    pending_move[0] += move_x
+    pending_move[1] += move_z
+    pending_move[2] = alt_move_x
+    pending_move[3] = alt_move_z
+
+def apply_pending_move():
+    """
+    Move the current piece by the steps queued since the last tick, at most
+    one cell along each axis. The X and Z steps are tried separately, so a
+    blocked axis doesn't stop the other one and the piece can't cut a corner.
+    If neither succeeds, try the last key's alternative step instead.
+    """
+    global scene_dirty
+    move_x = max(-1, min(1, pending_move[0]))
+    move_z = max(-1, min(1, pending_move[1]))
+    alt_move_x, alt_move_z = pending_move[2], pending_move[3]
+    pending_move[:] = (0, 0, 0, 0)
+    piece = game_state.current_piece
+    if piece is None or (move_x == 0 and move_z == 0):
+        return
+
+    # First try the primary movement, one axis at a time
+    moved_x = move_x != 0 and try_step(piece, move_x, 0)
+    moved_z = move_z != 0 and try_step(piece, 0, move_z)
+    moved = moved_x or moved_z
+    if not moved and (alt_move_x != 0 or alt_move_z != 0):
+        # If primary movement fails, try the alternative direction
+        moved = try_step(piece, alt_move_x, alt_move_z)
+
+    # Only redraw if the piece ended up somewhere new
+    if moved:
+        scene_dirty = True
+
+def try_step(piece, move_x, move_z):
+    """
+    Move 'piece' sideways by (move_x, move_z), or leave it where it was if
+    that collides. Returns True if the piece moved.
+    """
+    piece.move(move_x, 0, move_z)
+    if game_state.check_collision(piece.position):
+        piece.move(-move_x, 0, -move_z)
+        return False
+    return True
 
 ################################################################################
 #                                 MAIN                                        #
@@ -1291,23 +2021,26 @@ def main():
     # Loading screen start
     set_mode(STATE_LOADING)
     global previous_time
-    previous_time = glutGet(GLUT_ELAPSED_TIME)
+    previous_time = elapsed_ms()
 
     init_gl()
+    game_state.highscore_manager.start_writer()
 
     # Register callbacks
     glutDisplayFunc(display)
     glutReshapeFunc(reshape)
     glutKeyboardFunc(keyboard)
+    glutKeyboardUpFunc(keyboard_up)
     glutSpecialFunc(special_keys)
+    glutSpecialUpFunc(special_keys_up)
+    # Held keys are repeated by game_loop at a fixed rate, not by the OS
+    glutIgnoreKeyRepeat(1)
     glutMouseFunc(mouse_click)
     glutMotionFunc(mouse_motion)
+    glutVisibilityFunc(visibility)
     
     # Mouse wheel handling is already implemented in mouse_click
     # No need for separate glutMouseWheelFunc as we're using buttons 3 and 4
-    # Remove these commented sections as they're not needed:
-    # glutMouseWheelFunc = None
-    # glutKeyboardUpFunc = None
 
     glutTimerFunc(16, game_loop, 0)  # Start the game loop
 
@@ -1323,6 +2056,7 @@ def main():
         raise
     finally:
         # Ensure cleanup happens no matter what
+        game_state.highscore_manager.flush()
         game_state.music_manager.cleanup()
 
 if __name__ == "__main__":